@@ -30,7 +30,7 @@
 
 
 import argparse
-from level1c4pps.seviri2pps_lib import process_one_scan
+from level1c4pps.seviri2pps_lib import process_one_scan, CACHE_CONFIG
 
 # -----------------------------------------------------------------------------
 # Main:
@@ -52,7 +52,25 @@ if __name__ == "__main__":
     parser.add_argument('-ne', '--nc_engine', type=str, nargs='?',
                         required=False, default='h5netcdf',
                         help="Engine for saving netcdf files netcdf4 or h5netcdf (default).")
+    parser.add_argument('--compression', type=str, default='zlib',
+                        choices=['zlib', 'zstd'],
+                        help="Compression of netcdf variables, zlib (default) or zstd (requires netcdf4 engine).")
+    parser.add_argument('--cache_dir', type=str, default=None,
+                        required=False,
+                        help="Directory for caching lat/lon and satellite angles (requires zarr).")
+    parser.add_argument('--cache_lonlats', action='store_true',
+                        help="Cache lat/lon coordinates in cache_dir")
+    parser.add_argument('--cache_sensor_angles', action='store_true',
+                        help="Cache satellite angles in cache_dir. Cached angles are approximate: they are "
+                        "reused for satellite positions within ~0.1 deg, which changes satzenith by up to "
+                        "~0.08 deg.")
     options = parser.parse_args()
+    if options.compression == 'zstd' and options.nc_engine != 'netcdf4':
+        parser.error('--compression zstd requires --nc_engine netcdf4')
+    CACHE_CONFIG.update(cache_dir=options.cache_dir,
+                        cache_lonlats=options.cache_lonlats,
+                        cache_sensor_angles=options.cache_sensor_angles)
     process_one_scan(options.files, out_path=options.out_dir,
                      rotate=not options.no_rotation,
-                     engine=options.nc_engine)
+                     engine=options.nc_engine,
+                     compression=options.compression)
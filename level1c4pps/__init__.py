@@ -27,6 +27,7 @@ from pkg_resources import get_distribution, DistributionNotFound
 import numpy as np
 import xarray as xr
 from datetime import datetime
+from types import MappingProxyType
 import os
 import logging
 import satpy
@@ -239,74 +240,98 @@ def dt64_to_datetime(dt64):
     return dt64
 
 
-def get_encoding(scene, bandnames, pps_tagnames, chunks=None):
+# Encoding prototypes, copied by get_band_encoding
+_IR_ENCODING = MappingProxyType({
+    'dtype': 'int16',
+    'scale_factor': 0.01,
+    '_FillValue': -32767,
+    'zlib': True,
+    'complevel': 4,
+    'add_offset': 273.15})
+_REFL_ANGLE_ENCODING = MappingProxyType({
+    'dtype': 'int16',
+    'scale_factor': 0.01,
+    'zlib': True,
+    'complevel': 4,
+    '_FillValue': -32767,
+    'add_offset': 0.0})
+_LATLON_ENCODING = MappingProxyType({
+    'dtype': 'float32',
+    'zlib': True,
+    'complevel': 4,
+    '_FillValue': -999.0})
+_QUAL_FLAGS_ENCODING = MappingProxyType({
+    'dtype': 'int16',
+    'zlib': True,
+    'complevel': 4,
+    '_FillValue': -32001.0})
+_SCANLINE_TIMESTAMPS_ENCODING = MappingProxyType({
+    'dtype': 'int64',
+    'zlib': True,
+    'units': 'Milliseconds since 1970-01-01',
+    'complevel': 4,
+    '_FillValue': -1.0})
+
+
+# Zstandard compression, requires the netcdf4 engine and netCDF4 >= 1.6
+_ZSTD_ENCODING = MappingProxyType({
+    'compression': 'zstd',
+    'complevel': 3,
+    'shuffle': True})
+
+
+def get_encoding(scene, bandnames, pps_tagnames, chunks=None, compression='zlib'):
     """Get netcdf encoding for all datasets."""
     encoding = {}
     for dataset in scene.keys():
         try:
             name, enc = get_band_encoding(scene[dataset['name']], bandnames, pps_tagnames,
-                                          chunks=chunks)
+                                          chunks=chunks, compression=compression)
         except (NameError, TypeError):
             name, enc = get_band_encoding(scene[dataset.name], bandnames, pps_tagnames,
-                                          chunks=chunks)
+                                          chunks=chunks, compression=compression)
         except ValueError:
             continue
         encoding[name] = enc
     return encoding
 
 
-def get_band_encoding(dataset, bandnames, pps_tagnames, chunks=None):
-    """Get netcdf encoding for a datasets."""
+def get_band_encoding(dataset, bandnames, pps_tagnames, chunks=None, compression='zlib'):
+    """Get netcdf encoding for a datasets.
+
+    Compression is either 'zlib' (default) or 'zstd'. The latter is faster,
+    but requires the netcdf4 engine and readers with zstd support.
+    """
     name = dataset.attrs['name']
     id_tag = dataset.attrs.get('id_tag', None)
     enc = {}
     if id_tag is not None:
         if id_tag.startswith('ch_tb'):
             # IR channel
-            enc = {'dtype': 'int16',
-                   'scale_factor': 0.01,
-                   '_FillValue': -32767,
-                   'zlib': True,
-                   'complevel': 4,
-                   'add_offset': 273.15}
-        elif id_tag.startswith('ch_r'):
-            # Refl channel
-            enc = {'dtype': 'int16',
-                   'scale_factor': 0.01,
-                   'zlib': True,
-                   'complevel': 4,
-                   '_FillValue': -32767,
-                   'add_offset': 0.0}
-        elif id_tag in PPS_ANGLE_TAGS:
-            # Angle
-            enc = {
-                'dtype': 'int16',
-                'scale_factor': 0.01,
-                'zlib': True,
-                'complevel': 4,
-                '_FillValue': -32767,
-                'add_offset': 0.0}
+            enc = dict(_IR_ENCODING)
+        elif id_tag.startswith('ch_r') or id_tag in PPS_ANGLE_TAGS:
+            # Refl channel or angle
+            enc = dict(_REFL_ANGLE_ENCODING)
         if chunks is not None:
             enc['chunksizes'] = chunks
     if name in ['lon', 'lat']:
         # Lat/Lon
-        enc = {'dtype': 'float32',
-               'zlib': True,
-               'complevel': 4,
-               '_FillValue': -999.0}
+        enc = dict(_LATLON_ENCODING)
         if chunks is not None:
             enc['chunksizes'] = (chunks[1], chunks[2])
     elif name in ['qual_flags']:
         # pygac qual flags
-        enc = {'dtype': 'int16', 'zlib': True,
-               'complevel': 4, '_FillValue': -32001.0}
+        enc = dict(_QUAL_FLAGS_ENCODING)
     elif name in ['scanline_timestamps']:
         # pygac scanline_timestamps
-        enc = {'dtype': 'int64', 'zlib': True,
-               'units': 'Milliseconds since 1970-01-01',
-               'complevel': 4, '_FillValue': -1.0}
+        enc = dict(_SCANLINE_TIMESTAMPS_ENCODING)
     if not enc:
         raise ValueError('Unsupported band: {}'.format(name))
+    if compression == 'zstd':
+        del enc['zlib']
+        enc.update(_ZSTD_ENCODING)
+    elif compression != 'zlib':
+        raise ValueError('Unsupported compression: {}'.format(compression))
     return name, enc
 
 
@@ -532,17 +557,30 @@ def compose_filename(scene, out_path, instrument, band=None):
             instrument,
             platform_name_to_use_in_filename(platform_name),
             orbit_number,
-            datetime.strftime(dt64_to_datetime(start_time), '%Y%m%dT%H%M%S%f')[:-5],
-            datetime.strftime(dt64_to_datetime(end_time), '%Y%m%dT%H%M%S%f')[:-5]))
+            format_filename_time(dt64_to_datetime(start_time)),
+            format_filename_time(dt64_to_datetime(end_time))))
     return filename
 
 
+def format_filename_time(time):
+    """Format time as YYYYmmddTHHMMSS plus tenths of seconds.
+
+    Same as strftime('%Y%m%dT%H%M%S%f')[:-5], but avoids parsing the format
+    string for every file.
+    """
+    return '{:04d}{:02d}{:02d}T{:02d}{:02d}{:02d}{:d}'.format(
+        time.year, time.month, time.day, time.hour, time.minute, time.second,
+        time.microsecond // 100000)
+
+
 def get_header_attrs(scene, band, sensor='avhrr'):
     """Get global netcdf attributes."""
-    header_attrs = scene.attrs.copy()
-    header_attrs['start_time'] = datetime.strftime(dt64_to_datetime(band.attrs['start_time']),
-                                                   "%Y-%m-%d %H:%M:%S")
-    header_attrs['end_time'] = datetime.strftime(dt64_to_datetime(band.attrs['end_time']),
-                                                 "%Y-%m-%d %H:%M:%S")
-    header_attrs['sensor'] = sensor
-    return header_attrs
+    return dict(scene.attrs,
+                start_time=format_header_time(dt64_to_datetime(band.attrs['start_time'])),
+                end_time=format_header_time(dt64_to_datetime(band.attrs['end_time'])),
+                sensor=sensor)
+
+
+def format_header_time(time):
+    """Format time as YYYY-mm-dd HH:MM:SS (same as strftime, but faster)."""
+    return time.replace(microsecond=0).isoformat(' ')
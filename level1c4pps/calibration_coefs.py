@@ -24,6 +24,7 @@
 """Module with calibration coefficients for SEVIRI."""
 
 import datetime
+import numpy as np
 
 CALIB_MODE = 'Nominal'
 COEFS_MEIRINK = dict(
@@ -49,30 +50,52 @@ COEFS_MEIRINK = dict(
     )
 )
 
-REF_DATE = datetime.date(2000, 1, 1)
-REF_TIME = datetime.datetime(2000, 1, 1, 0, 0)
+CHANNELS = ('VIS006', 'VIS008', 'IR_016')
 
+# Coefficients (a, b) per platform and channel
+_COEF_LUT = {platform: {channel: (coefs[channel]['a'], coefs[channel]['b'])
+                        for channel in CHANNELS}
+             for platform, coefs in COEFS_MEIRINK.items()}
 
-def calib_meirink(platform, channel, time):
-    """Get MODIS-intercalibrated gain and offset for SEVIRI VIS channels.
+REF_DATE = datetime.date(2000, 1, 1)
+REF_TIME = datetime.datetime(2000, 1, 1, 0, 0)
 
-    Reference: http://msgcpp.knmi.nl/mediawiki/index.php/MSG-SEVIRI_solar_channel_calibration
 
-    :returns: gain, offset [mW m-2 sr-1 (cm-1)-1]
-    """
+def _get_delta_days_for_time(time):
+    """Get number of days since reference time."""
     if time < REF_TIME:
         raise ValueError('Given time ({0}) is < reference time ({1})'.format(
             time, REF_TIME))
+    return (time - REF_TIME).total_seconds() / 3600.0 / 24.0
+
+
+def _get_delta_days_for_date(date):
+    """Get number of days since reference date."""
+    if date < REF_DATE:
+        raise ValueError('Given date ({0}) is < reference date ({1})'.format(
+            date, REF_DATE))
+    return (date - REF_DATE).days
+
 
-    a = COEFS_MEIRINK[platform][channel]['a']
-    b = COEFS_MEIRINK[platform][channel]['b']
-    delta_days = (time - REF_TIME).total_seconds() / 3600.0 / 24.0
+def _calib_meirink_days(platform, channel, delta_days):
+    """Get gain and offset for the given number of days since reference."""
+    a, b = _COEF_LUT[platform][channel]
     gain = (b + a * delta_days) / 1000.0  # micro Watts -> milli Watts
     offset = -51.0 * gain  # Space count is 51
-
     return gain, offset
 
 
+def calib_meirink(platform, channel, time):
+    """Get MODIS-intercalibrated gain and offset for SEVIRI VIS channels.
+
+    Reference: http://msgcpp.knmi.nl/mediawiki/index.php/MSG-SEVIRI_solar_channel_calibration
+
+    :returns: gain, offset [mW m-2 sr-1 (cm-1)-1]
+    """
+    return _calib_meirink_days(platform, channel,
+                               _get_delta_days_for_time(time))
+
+
 def calib_meirink_date(platform, channel, date):
     """Get MODIS-intercalibrated gain and offset for SEVIRI VIS channels.
 
@@ -80,48 +103,52 @@ def calib_meirink_date(platform, channel, date):
 
     :returns: gain, offset [mW m-2 sr-1 (cm-1)-1]
     """
-    if date < REF_DATE:
-        raise ValueError('Given date ({0}) is < reference date ({1})'.format(
-            date, REF_DATE))
+    return _calib_meirink_days(platform, channel,
+                               _get_delta_days_for_date(date))
 
-    a = COEFS_MEIRINK[platform][channel]['a']
-    b = COEFS_MEIRINK[platform][channel]['b']
-    gain = (b + a*(date - REF_DATE).days) / 1000.0  # micro Watts -> milli Watts
-    offset = -51.0 * gain  # Space count is 51
 
-    return gain, offset
+def _get_calibration_for_days(platform, delta_days):
+    """Get gain and offset for all channels."""
+    coefs = {}
+    for channel in CHANNELS:
+        gain, offset = _calib_meirink_days(platform, channel, delta_days)
+        coefs[channel] = {'gain': gain, 'offset': offset}
+    return coefs
 
 
 def get_calibration_for_time(platform, time):
     """Get MODIS-intercalibrated gain and offset for specific time."""
-    coefs = {}
-    for channel in ('VIS006', 'VIS008', 'IR_016'):
-        gain, offset = calib_meirink(platform=platform, channel=channel,
-                                     time=time)
-        coefs[channel] = {'gain': gain, 'offset': offset}
+    return _get_calibration_for_days(platform,
+                                     _get_delta_days_for_time(time))
 
-    return coefs
+
+def get_calibration_for_times(platform, times):
+    """Get MODIS-intercalibrated gain and offset for multiple times.
+
+    Args:
+        platform: Platform short name, e.g. MSG3
+        times: Array-like of datetime64 or datetime objects
+
+    Returns:
+        Dictionary {channel: {'gain': array, 'offset': array}}
+    """
+    times = np.asarray(times, dtype='datetime64[ns]')
+    ref_time = np.datetime64(REF_TIME, 'ns')
+    if np.any(times < ref_time):
+        raise ValueError('Given times ({0}) are < reference time ({1})'.format(
+            times, REF_TIME))
+    delta_days = (times - ref_time) / np.timedelta64(1, 'D')
+    return _get_calibration_for_days(platform, delta_days)
 
 
 def get_calibration_for_date(platform, date):
     """Get MODIS-intercalibrated gain and offset for specific date."""
-    coefs = {}
-    for channel in ('VIS006', 'VIS008', 'IR_016'):
-        gain, offset = calib_meirink_date(platform=platform, channel=channel,
-                                          date=date)
-        coefs[channel] = {'gain': gain, 'offset': offset}
-
-    return coefs
+    return _get_calibration_for_days(platform,
+                                     _get_delta_days_for_date(date))
 
 
 if __name__ == '__main__':
     time = datetime.datetime(2018, 1, 18, 12, 0)
     platform = 'MSG3'
 
-    coefs = {}
-    for channel in ('VIS006', 'VIS008', 'IR_016'):
-        gain, offset = calib_meirink(platform=platform, channel=channel,
-                                     time=time)
-        coefs[channel] = {'gain': gain, 'offset': offset}
-
-    print(coefs)
+    print(get_calibration_for_time(platform=platform, time=time))
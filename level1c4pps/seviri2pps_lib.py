@@ -30,8 +30,13 @@
 
 
 import os
+import functools
+import hashlib
+import shutil
+from collections import OrderedDict
 import numpy as np
 import xarray as xr
+import dask
 import dask.array as da
 from glob import glob
 import time
@@ -74,6 +79,38 @@ PPS_TAGNAMES = {'VIS006': 'ch_r06',
                 'WV_062': 'ch_tb67',
                 'WV_073': 'ch_tb73'}
 
+BAND_ATTRS_TO_REMOVE = ('orbital_parameters', 'satellite_longitude',
+                        'satellite_latitude', 'satellite_altitude',
+                        'platform_name', 'sensor', 'georef_offset_corrected')
+
+COORD_ATTRS = {'lat': {'long_name': 'latitude coordinate',
+                       'standard_name': 'latitude',
+                       'units': 'degrees_north'},
+               'lon': {'long_name': 'longitude coordinate',
+                       'standard_name': 'longitude',
+                       'units': 'degrees_east'}}
+
+# Angles stored as scaled int16
+ANGLE_NAMES = ('sunzenith', 'satzenith', 'azimuthdiff')
+ANGLE_SCALE_FACTOR = 0.01
+ANGLE_FILL_VALUE = -32767
+
+# Chunksizes (y, x) of 2D datasets in memory and in the netcdf file
+CHUNKS = (512, 3712)
+
+# Lat/lon coordinates of the most recently used areas, see get_lonlats.
+# Each full disk entry holds two 3712x3712 float64 arrays (~220 MB).
+_LONLAT_CACHE = OrderedDict()
+_LONLAT_CACHE_SIZE = 2
+
+# Minimum number of bands for processing bands in parallel
+MIN_BANDS_PARALLEL = 4
+
+# On-disk cache for geolocation and satellite angles. Requires zarr.
+CACHE_CONFIG = {'cache_dir': None,
+                'cache_lonlats': False,
+                'cache_sensor_angles': False}
+
 # H-000-MSG3__-MSG3________-IR_120___-000003___-201410051115-__:
 HRIT_FILE_PATTERN = ('{rate:1s}-000-{hrit_format:_<6s}-'
                      '{platform_shortname:_<12s}-{channel:_<8s}_-'
@@ -82,19 +119,209 @@ HRIT_FILE_PATTERN = ('{rate:1s}-000-{hrit_format:_<6s}-'
 
 def rotate_band(scene, band):
     """Rotate band by 180 degrees."""
-    scene[band] = scene[band].reindex(x=scene[band].x[::-1],
-                                      y=scene[band].y[::-1])
+    # Reverse slicing returns views (or lazy slices for dask arrays) and
+    # flips the coordinates along with the data.
+    scene[band] = scene[band].isel(x=slice(None, None, -1),
+                                   y=slice(None, None, -1))
     llx, lly, urx, ury = scene[band].attrs['area'].area_extent
     scene[band].attrs['area'] = scene[band].attrs['area'].copy(
         area_extent=[urx, ury, llx, lly])
 
 
+def _area_cache_key(area):
+    """Get cache key describing an area.
+
+    Besides shape and extent (which distinguishes rotated from unrotated
+    images) the key includes the projection, because geos area extents are
+    relative to the sub-satellite point and area ids are not unique across
+    satellite positions.
+    """
+    return (area.area_id, area.crs.to_wkt(), tuple(area.shape),
+            tuple(float(ext) for ext in area.area_extent))
+
+
+def cache_to_zarr(enabled_flag, key_func, names):
+    """Cache arrays computed by the decorated function in zarr stores.
+
+    Args:
+        enabled_flag: Name of the flag in CACHE_CONFIG enabling the cache.
+        key_func: Function computing the cache key from the arguments of the
+            decorated function.
+        names: Names of the arrays returned by the decorated function.
+
+    Caching is only active if CACHE_CONFIG['cache_dir'] is set and the
+    given flag is True. Cached results persist across runs and are reused
+    for all arguments mapping to the same key, so results cached with an
+    approximate key (such as satellite angles) are approximate as well.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache_dir = CACHE_CONFIG['cache_dir']
+            if not (cache_dir and CACHE_CONFIG[enabled_flag]):
+                return func(*args, **kwargs)
+            key = hashlib.sha1(
+                repr(key_func(*args, **kwargs)).encode()).hexdigest()
+            path = os.path.join(cache_dir, '{}_{}.zarr'.format(func.__name__, key))
+            if os.path.exists(path):
+                cached = xr.open_zarr(path, consolidated=False)
+                return tuple(cached[name].values for name in names)
+
+            result = func(*args, **kwargs)
+            tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+            xr.Dataset({name: (('y', 'x'), np.asarray(arr))
+                        for name, arr in zip(names, result)}).to_zarr(
+                            tmp_path, mode='w', consolidated=False)
+            try:
+                os.rename(tmp_path, path)
+            except OSError:
+                # Written concurrently by another process
+                shutil.rmtree(tmp_path, ignore_errors=True)
+            return result
+        return wrapper
+    return decorator
+
+
+def _satellite_angles_cache_key(dataset, lons, lats):
+    """Get cache key for satellite angles.
+
+    The satellite position is rounded to 0.1 degrees and 1 km, so cached
+    angles are approximate: they may stem from a satellite position that
+    differs by up to ~0.1 degrees, which changes the satellite zenith angle
+    by up to ~0.08 degrees.
+    """
+    sat_lon, sat_lat, sat_alt = satpy.utils.get_satpos(dataset)
+    return (_area_cache_key(dataset.attrs['area']),
+            _round_satpos(sat_lon, sat_lat, sat_alt * 0.001))
+
+
 def get_lonlats(dataset):
-    """Get lat/lon coordinates."""
-    lons, lats = dataset.attrs['area'].get_lonlats()
-    lons[np.fabs(lons) > 360] = np.nan
-    lats[np.fabs(lats) > 90] = np.nan
-    return lons, lats
+    """Get lat/lon coordinates.
+
+    The coordinates of the most recently used areas are cached, so they must
+    not be modified in place.
+    """
+    area = dataset.attrs['area']
+    key = _area_cache_key(area)
+    if key in _LONLAT_CACHE:
+        _LONLAT_CACHE.move_to_end(key)
+        return _LONLAT_CACHE[key]
+    lonlats = _compute_lonlats(area)
+    _LONLAT_CACHE[key] = lonlats
+    if len(_LONLAT_CACHE) > _LONLAT_CACHE_SIZE:
+        _LONLAT_CACHE.popitem(last=False)
+    return lonlats
+
+
+@cache_to_zarr('cache_lonlats', key_func=_area_cache_key, names=('lon', 'lat'))
+def _compute_lonlats(area):
+    """Compute lat/lon coordinates of the given area."""
+    lons, lats = area.get_lonlats()
+    return mask_lonlats(lons, lats)
+
+
+def mask_lonlats(lons, lats):
+    """Set invalid longitudes (> 360) and latitudes (> 90) to NaN.
+
+    If numba is available, both arrays are masked in a single pass by a
+    compiled kernel.
+    """
+    kernel = _get_mask_lonlats_kernel()
+    if kernel is not None and lons.dtype == lats.dtype and lons.dtype.kind == 'f':
+        if isinstance(lons, da.Array) or isinstance(lats, da.Array):
+            return da.apply_gufunc(kernel, '(n),(n)->(n),(n)',
+                                   lons, lats,
+                                   output_dtypes=(lons.dtype, lats.dtype),
+                                   allow_rechunk=True)
+        return kernel(lons, lats)
+    return _mask_invalid(lons, limit=360), _mask_invalid(lats, limit=90)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_mask_lonlats_kernel():
+    """Get numba kernel for masking lat/lon, or None if numba is unavailable.
+
+    Importing numba and compiling the kernel is expensive, so it is done on
+    first use rather than at import.
+    """
+    try:
+        from numba import guvectorize
+    except ImportError:
+        return None
+
+    @guvectorize(['void(float32[:], float32[:], float32[:], float32[:])',
+                  'void(float64[:], float64[:], float64[:], float64[:])'],
+                 '(n),(n)->(n),(n)', nopython=True, target='parallel')
+    def mask_lonlats_kernel(lons, lats, lons_out, lats_out):
+        """Mask invalid longitudes and latitudes in one pass."""
+        for i in range(lons.shape[0]):
+            lons_out[i] = np.nan if abs(lons[i]) > 360 else lons[i]
+            lats_out[i] = np.nan if abs(lats[i]) > 90 else lats[i]
+
+    return mask_lonlats_kernel
+
+
+def _mask_invalid(arr, limit):
+    """Set values exceeding the given absolute limit to NaN.
+
+    Numpy arrays are masked in place, dask arrays are masked lazily chunk by
+    chunk.
+    """
+    if isinstance(arr, da.Array):
+        return da.where(da.fabs(arr) > limit, np.nan, arr)
+    np.copyto(arr, np.nan, where=np.fabs(arr) > limit)
+    return arr
+
+
+def _array_key(arr):
+    """Get a cheap cache key for an array.
+
+    Arrays are identified by object identity, shape and dtype. This is only
+    safe because the memoizer keeps a reference to the keyed arrays, so that
+    their ids cannot be reused while the cache entry is alive.
+    """
+    return id(arr), getattr(arr, 'shape', None), str(getattr(arr, 'dtype', ''))
+
+
+def _round_satpos(sat_lon, sat_lat, sat_alt):
+    """Round satellite position to avoid cache misses due to float jitter.
+
+    Angles computed from the rounded position are approximate, so this is
+    only used for the opt-in on-disk cache.
+    """
+    return round(sat_lon, 1), round(sat_lat, 1), round(sat_alt)
+
+
+def memoize_angles(key_func, maxsize=1):
+    """Memoize angle computations.
+
+    Args:
+        key_func: Function computing a hashable cache key from the arguments
+            of the decorated function.
+        maxsize: Maximum number of cached results.
+
+    Cached results are shared between callers, so they must not be modified
+    in place.
+    """
+    def decorator(func):
+        cache = OrderedDict()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = key_func(*args, **kwargs)
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key][1]
+            result = func(*args, **kwargs)
+            # Keep references to the arguments so that ids in the key stay valid
+            cache[key] = ((args, kwargs), result)
+            if len(cache) > maxsize:
+                cache.popitem(last=False)
+            return result
+
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
 
 
 def get_solar_angles(scene, lons, lats):
@@ -120,6 +347,9 @@ def get_solar_angles(scene, lons, lats):
     return suna, sunz
 
 
+@cache_to_zarr('cache_sensor_angles',
+               key_func=_satellite_angles_cache_key,
+               names=('sata', 'satz'))
 def get_satellite_angles(dataset, lons, lats):
     """Compute satellite angles.
 
@@ -133,22 +363,13 @@ def get_satellite_angles(dataset, lons, lats):
     # altitude in meters and pyorbital expecting km).
     #
     # if:
-    #   1) get_observer_look() gives wrong answer ...
-    #   ... for satellite altitude in m. AND
-    #   2) get_observer_look() gives correct answer ...
-    #   ....  for satellite altitude in km. AND
-    #   3) Satellite altitude is m.:
+    #   1) pyorbital expects altitude in km (checked once per process) AND
+    #   2) Satellite altitude is m.:
     #    => Satellite alltitude need to be converted to km.
     # else:
     #    => There have been updates to SatPy and this script
     #       need to be modified.
-    if not (get_observer_look(0, 0, 36000*1000,
-                              datetime.utcnow(), np.array([16]),
-                              np.array([58]), np.array([0]))[1] > 30 and
-            get_observer_look(0, 0, 36000,
-                              datetime.utcnow(), np.array([16]),
-                              np.array([58]), np.array([0]))[1] < 23 and
-            sat_alt > 38000):
+    if not (_pyorbital_expects_km() and sat_alt > 38000):
         raise UnexpectedSatpyVersion(
             'Unexpected handling of satellite altitude in pyorbital/'
             'satpy. Conversion to km is probably unneeded and wrong.')
@@ -157,18 +378,71 @@ def get_satellite_angles(dataset, lons, lats):
     # current version of pyorbital
     sat_alt *= 0.001
 
-    # Compute angles
+    return _compute_satellite_angles(sat_lon, sat_lat, sat_alt,
+                                     dataset.attrs['start_time'], lons, lats)
+
+
+@functools.lru_cache(maxsize=None)
+def _pyorbital_expects_km():
+    """Check whether pyorbital expects the satellite altitude in km.
+
+    True if get_observer_look() gives a wrong answer for the satellite
+    altitude in m and the correct answer for the altitude in km. The result
+    is cached, so that the check runs only once per process.
+    """
+    return (get_observer_look(0, 0, 36000*1000,
+                              datetime.utcnow(), np.array([16]),
+                              np.array([58]), np.array([0]))[1] > 30 and
+            get_observer_look(0, 0, 36000,
+                              datetime.utcnow(), np.array([16]),
+                              np.array([58]), np.array([0]))[1] < 23)
+
+
+@memoize_angles(lambda sat_lon, sat_lat, sat_alt, start_time, lons, lats: (
+    (sat_lon, sat_lat, sat_alt), _array_key(lons), _array_key(lats)))
+def _compute_satellite_angles(sat_lon, sat_lat, sat_alt, start_time, lons,
+                              lats):
+    """Compute satellite azimuth and zenith angles for the given position.
+
+    For a geostationary satellite the angles only depend on satellite
+    position and lat/lon, so the time is not part of the cache key. The
+    satellite position is not rounded, because even small drifts of the
+    position change the angles by more than the precision stored in the
+    output file. Angles are therefore only reused across scans with exactly
+    the same satellite position.
+    """
     sata, satel = get_observer_look(
         sat_lon,
         sat_lat,
         sat_alt,
-        dataset.attrs['start_time'],
+        start_time,
         lons, lats, 0)
-    satz = 90 - satel
+
+    # Convert elevation to zenith angle, in place for numpy arrays to avoid
+    # allocating another full-disk array.
+    if isinstance(satel, np.ndarray) and satel.dtype.kind == 'f':
+        satz = np.subtract(90.0, satel, out=satel)
+    else:
+        satz = 90 - satel
 
     return sata, satz
 
 
+def apply_to_bands(func, scene, *args):
+    """Apply func(scene, image_num, band, *args) to all bands.
+
+    The bands are processed in parallel using dask's threaded scheduler,
+    unless there are fewer than MIN_BANDS_PARALLEL bands.
+    """
+    if len(BANDNAMES) < MIN_BANDS_PARALLEL:
+        for image_num, band in enumerate(BANDNAMES):
+            func(scene, image_num, band, *args)
+    else:
+        dask.compute(*[dask.delayed(func, pure=False)(scene, image_num, band, *args)
+                       for image_num, band in enumerate(BANDNAMES)],
+                     scheduler='threads')
+
+
 def set_attrs(scene):
     """Set global and band attributes."""
     # Global
@@ -180,21 +454,24 @@ def set_attrs(scene):
     scene.attrs['date_created'] = nowutc.strftime("%Y-%m-%dT%H:%M:%SZ")
 
     # For each band
-    for image_num, band in enumerate(BANDNAMES):
-        idtag = PPS_TAGNAMES[band]
-        scene[band].attrs['id_tag'] = idtag
-        scene[band].attrs['description'] = 'SEVIRI ' + str(band)
-        if 'sun_earth_distance_correction_factor' not in scene[band].attrs:
-            scene[band].attrs['sun_earth_distance_correction_applied'] = False
-            scene[band].attrs['sun_earth_distance_correction_factor'] = 1.0
-        scene[band].attrs['sun_zenith_angle_correction_applied'] = False
-        scene[band].attrs['name'] = "image{:d}".format(image_num)
-
-        # Cosmetics
-        for attr in ['orbital_parameters', 'satellite_longitude',
-                     'satellite_latitude', 'satellite_altitude',
-                     'platform_name', 'sensor', 'georef_offset_corrected']:
-            scene[band].attrs.pop(attr, None)
+    apply_to_bands(_set_band_attrs, scene)
+
+
+def _set_band_attrs(scene, image_num, band):
+    """Set band attributes."""
+    attrs = scene[band].attrs
+    attrs.update({
+        'id_tag': PPS_TAGNAMES[band],
+        'description': 'SEVIRI ' + str(band),
+        'sun_zenith_angle_correction_applied': False,
+        'name': "image{:d}".format(image_num)})
+    if 'sun_earth_distance_correction_factor' not in attrs:
+        attrs['sun_earth_distance_correction_applied'] = False
+        attrs['sun_earth_distance_correction_factor'] = 1.0
+
+    # Cosmetics
+    for attr in BAND_ATTRS_TO_REMOVE:
+        attrs.pop(attr, None)
 
 
 def get_mean_acq_time(scene):
@@ -206,7 +483,7 @@ def get_mean_acq_time(scene):
     # to NaN manually
     acq_times = []
     for band in BANDNAMES:
-        acq_time = scene[band].coords['acq_time'].drop('acq_time')
+        acq_time = scene[band].coords['acq_time'].drop_vars('acq_time')
         is_nat = np.isnat(acq_time.values)
         acq_time = acq_time.astype(int).where(np.logical_not(is_nat))
         acq_times.append(acq_time)
@@ -219,24 +496,36 @@ def get_mean_acq_time(scene):
 def update_coords(scene):
     """Update band coordinates."""
     mean_acq_time = get_mean_acq_time(scene)
-    for band in BANDNAMES:
-        # Override channel-specific scanline timestamps with mean acquisition
-        # time. The differences are not very large and the resulting nc file
-        # is much simpler.
-        scene[band]['acq_time'] = mean_acq_time
+    apply_to_bands(_update_band_coords, scene, mean_acq_time)
 
-        # Remove area, set lat/lon as coordinates
-        scene[band].attrs['coordinates'] = 'lon lat'
-        area = scene[band].attrs.pop('area', None)
-        if area:
-            scene.attrs['area'] = area
 
-        # Add time coordinate to make cfwriter aware that we want 3D data
-        scene[band].coords['time'] = scene[band].attrs['start_time']
+def _update_band_coords(scene, image_num, band, mean_acq_time):
+    """Update coordinates of a single band."""
+    dataset = scene[band]
+
+    # Remove area, set lat/lon as coordinates
+    dataset.attrs['coordinates'] = 'lon lat'
+    area = dataset.attrs.pop('area', None)
+    if area:
+        scene.attrs['area'] = area
+
+    # Override channel-specific scanline timestamps with mean acquisition
+    # time. The differences are not very large and the resulting nc file
+    # is much simpler. Add time coordinate to make cfwriter aware that we
+    # want 3D data.
+    dataset.coords.update({'acq_time': mean_acq_time,
+                           'time': dataset.attrs['start_time']})
+
+
+def _as_dask_array(data, chunks):
+    """Wrap numpy arrays in dask arrays and rechunk dask arrays."""
+    if isinstance(data, da.Array):
+        return data.rechunk(chunks)
+    return da.from_array(data, chunks=chunks)
 
 
 def add_ancillary_datasets(scene, lons, lats, sunz, satz, azidiff,
-                           chunks=(512, 3712)):
+                           chunks=CHUNKS):
     """Add ancillary datasets to the scene.
 
     Args:
@@ -245,52 +534,44 @@ def add_ancillary_datasets(scene, lons, lats, sunz, satz, azidiff,
         sunz: Solar zenith angle
         satz: Satellite zenith angle
         azidiff: Absolute azimuth difference angle
-        chunks: Chunksize
+        chunks: Chunksize. Should match the chunksizes used for netcdf
+            encoding, so that each dask chunk is written as one netcdf chunk.
 
     """
-    start_time = scene['IR_108'].attrs['start_time']
-    end_time = scene['IR_108'].attrs['end_time']
-    angle_coords = scene['IR_108'].coords
-
-    # Latitude
-    scene['lat'] = xr.DataArray(
-        da.from_array(lats, chunks=chunks),
-        dims=['y', 'x'],
-        coords={'y': scene['IR_108']['y'], 'x': scene['IR_108']['x']})
-    scene['lat'].attrs['long_name'] = 'latitude coordinate'
-    scene['lat'].attrs['standard_name'] = 'latitude'
-    scene['lat'].attrs['units'] = 'degrees_north'
-    scene['lat'].attrs['start_time'] = start_time
-    scene['lat'].attrs['end_time'] = end_time
-
-    # Longitude
-    scene['lon'] = xr.DataArray(
-        da.from_array(lons, chunks=chunks),
-        dims=['y', 'x'],
-        coords={'y': scene['IR_108']['y'], 'x': scene['IR_108']['x']})
-    scene['lon'].attrs['long_name'] = 'longitude coordinate'
-    scene['lon'].attrs['standard_name'] = 'longitude'
-    scene['lon'].attrs['units'] = 'degrees_east'
-    scene['lon'].attrs['start_time'] = start_time
-    scene['lon'].attrs['end_time'] = end_time
-
-    # Sunzenith
-    scene['sunzenith'] = xr.DataArray(
-        da.from_array(sunz[:, :], chunks=chunks),
-        dims=['y', 'x'], coords=angle_coords)
-
-    # Satzenith
-    scene['satzenith'] = xr.DataArray(
-        da.from_array(satz[:, :], chunks=chunks),
-        dims=['y', 'x'], coords=angle_coords)
-
-    # Azidiff
-    scene['azimuthdiff'] = xr.DataArray(
-        da.from_array(azidiff[:, :], chunks=chunks),
-        dims=['y', 'x'], coords=angle_coords)
+    ir_108 = scene['IR_108']
+    datasets = {'lon': lons, 'lat': lats, 'sunzenith': sunz,
+                'satzenith': satz, 'azimuthdiff': azidiff}
+    ancillary = xr.Dataset(
+        {name: (('y', 'x'), _as_dask_array(data, chunks))
+         for name, data in datasets.items()},
+        coords={'y': ir_108['y'], 'x': ir_108['x']})
+
+    # Latitude/Longitude
+    for name, attrs in COORD_ATTRS.items():
+        scene[name] = ancillary[name]
+        scene[name].attrs.update(attrs)
+        scene[name].attrs['start_time'] = ir_108.attrs['start_time']
+        scene[name].attrs['end_time'] = ir_108.attrs['end_time']
+
+    # Angles
+    for name in ANGLE_NAMES:
+        scene[name] = ancillary[name].copy(data=scale_angle(ancillary[name].data))
 
     # Update the attributes
-    update_angle_attributes(scene, band=scene['IR_108'])
+    update_angle_attributes(scene, band=ir_108)
+    for name in ANGLE_NAMES:
+        scene[name].attrs.update(scale_factor=ANGLE_SCALE_FACTOR,
+                                 add_offset=0.0)
+
+
+def scale_angle(angle):
+    """Scale angle (in degrees) to int16 as in the netcdf file.
+
+    This reduces memory consumption and avoids scaling in the netcdf writer.
+    Invalid values are set to ANGLE_FILL_VALUE.
+    """
+    scaled = da.round(angle / ANGLE_SCALE_FACTOR)
+    return da.where(da.isnan(scaled), ANGLE_FILL_VALUE, scaled).astype('int16')
 
 
 def add_proj_satpos(scene):
@@ -366,14 +647,22 @@ def add_proj_satpos(scene):
     )
 
 
-def get_encoding_seviri(scene):
+def get_encoding_seviri(scene, compression='zlib'):
     """Get netcdf encoding for all datasets."""
     # Bands
-    chunks = (1, 512, 3712)
+    chunks = (1, ) + CHUNKS
     encoding = get_encoding(scene,
                             bandnames=BANDNAMES,
                             pps_tagnames=PPS_TAGNAMES,
-                            chunks=chunks)
+                            chunks=chunks,
+                            compression=compression)
+
+    # Angles are already scaled to int16 by add_ancillary_datasets
+    for angle in ANGLE_NAMES:
+        if angle in scene and 'scale_factor' in scene[angle].attrs:
+            enc = encoding[scene[angle].attrs['name']]
+            enc.pop('scale_factor', None)
+            enc.pop('add_offset', None)
 
     # Time
     acq_units = scene.attrs['start_time'].strftime(
@@ -391,14 +680,19 @@ def get_encoding_seviri(scene):
 
 def get_header_attrs(scene):
     """Get global netcdf attributes."""
-    header_attrs = scene.attrs.copy()
-    for key in ['sensor', 'area']:
-        header_attrs.pop(key, None)
-    return header_attrs
+    return {key: value for key, value in scene.attrs.items()
+            if key not in ('sensor', 'area')}
 
 
-def process_one_scan(tslot_files, out_path, rotate=True, engine='h5netcdf'):
-    """Make level 1c files in PPS-format."""
+def process_one_scan(tslot_files, out_path, rotate=True, engine='h5netcdf',
+                     compression='zlib'):
+    """Make level 1c files in PPS-format.
+
+    Zstandard compression (compression='zstd') requires engine='netcdf4'.
+    """
+    if compression == 'zstd' and engine != 'netcdf4':
+        raise ValueError('Compression zstd requires the netcdf4 engine, '
+                         'got engine {}'.format(engine))
     for fname in tslot_files:
         if not os.path.isfile(fname):
             raise FileNotFoundError('No such file: {}'.format(fname))
@@ -453,7 +747,7 @@ def process_one_scan(tslot_files, out_path, rotate=True, engine='h5netcdf'):
                        filename=filename,
                        header_attrs=get_header_attrs(scn_),
                        engine=engine,
-                       encoding=get_encoding_seviri(scn_),
+                       encoding=get_encoding_seviri(scn_, compression=compression),
                        unlimited_dims=['time'],
                        include_lonlats=False,
                        pretty=True,
@@ -485,3 +779,37 @@ def process_all_scans_in_dname(dname, out_path, ok_dates=None, rotate=False):
             process_one_scan(tslot_files, out_path, rotate=rotate)
         except Exception:
             pass
+
+
+def process_scenes_batch(tslot_files_list, out_path, n_workers=None, **kwargs):
+    """Make level 1c files for several scans in parallel.
+
+    Each scan is processed by process_one_scan in a worker of a local
+    dask.distributed cluster (requires dask.distributed). The workers are
+    separate processes, so the current CACHE_CONFIG is passed on to each task.
+
+    Args:
+        tslot_files_list: List of hrit file lists, one list per scan
+        out_path: Output directory
+        n_workers: Number of worker processes (dask default if None)
+        kwargs: Passed on to process_one_scan
+
+    Returns:
+        List of written filenames
+
+    """
+    from dask.distributed import Client
+
+    cache_config = dict(CACHE_CONFIG)
+    tasks = [dask.delayed(_process_one_scan_with_cache_config, pure=False)(
+                 cache_config, tslot_files, out_path, **kwargs)
+             for tslot_files in tslot_files_list]
+    with Client(n_workers=n_workers, threads_per_worker=1) as client:
+        return list(dask.compute(*tasks, scheduler=client))
+
+
+def _process_one_scan_with_cache_config(cache_config, tslot_files, out_path,
+                                        **kwargs):
+    """Apply cache configuration (in a worker process) and process one scan."""
+    CACHE_CONFIG.update(cache_config)
+    return process_one_scan(tslot_files, out_path, **kwargs)
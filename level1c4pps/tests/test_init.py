@@ -19,7 +19,12 @@
 
 """Unit tests for misc functions in __init__.py."""
 
+import datetime as dt
 import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
 import xarray as xr
 import level1c4pps
 import numpy as np
@@ -34,6 +39,37 @@ class TestInit(unittest.TestCase):
         self.assertRaises(ValueError, level1c4pps.get_band_encoding, ds,
                           None, None)
 
+    def test_get_band_encoding_compression(self):
+        """Test get encoding with zstd compression."""
+        ds = xr.DataArray([], attrs={'name': 'image0', 'id_tag': 'ch_r06'})
+        name, enc = level1c4pps.get_band_encoding(ds, None, None,
+                                                  chunks=(1, 512, 3712),
+                                                  compression='zstd')
+        self.assertEqual(name, 'image0')
+        self.assertDictEqual(enc, {'dtype': 'int16',
+                                   'scale_factor': 0.01,
+                                   'add_offset': 0.0,
+                                   '_FillValue': -32767,
+                                   'compression': 'zstd',
+                                   'complevel': 3,
+                                   'shuffle': True,
+                                   'chunksizes': (1, 512, 3712)})
+        self.assertRaises(ValueError, level1c4pps.get_band_encoding, ds,
+                          None, None, compression='lzf')
+
+    def test_get_header_attrs(self):
+        """Test get the header attributes."""
+        scene = mock.MagicMock(attrs={'foo': 'bar', 'sensor': 'SEVIRI'})
+        band = mock.MagicMock(attrs={
+            'start_time': dt.datetime(2009, 7, 1, 12, 15, 1, 999999),
+            'end_time': np.datetime64('2009-07-01T12:30:00.500')})
+        header_attrs = level1c4pps.get_header_attrs(scene, band, sensor='avhrr')
+        self.assertDictEqual(header_attrs, {'foo': 'bar',
+                                            'start_time': '2009-07-01 12:15:01',
+                                            'end_time': '2009-07-01 12:30:00',
+                                            'sensor': 'avhrr'})
+        self.assertEqual(scene.attrs['sensor'], 'SEVIRI')
+
     def test_adjust_lons(self):
         from level1c4pps import centered_modulus
         in_lons = xr.DataArray([340.0, 10.0, -22.0])
@@ -45,6 +81,14 @@ class TestInit(unittest.TestCase):
         np.testing.assert_allclose(centered_modulus(in_lons_np),
                                    out_lons_np, rtol=0.00001)
 
+    def test_format_filename_time(self):
+        """Test formatting of times in filenames."""
+        for time in [dt.datetime(2009, 7, 1, 12, 15),
+                     dt.datetime(1981, 3, 30, 4, 23, 58, 254000),
+                     dt.datetime(2020, 12, 31, 23, 59, 59, 999999)]:
+            self.assertEqual(level1c4pps.format_filename_time(time),
+                             time.strftime('%Y%m%dT%H%M%S%f')[:-5])
+
 
 def suite():
     """Create the test suite for test_init."""
@@ -22,9 +22,12 @@
 
 """Unit tests for the seviri2pps_lib module."""
 
+import dask.array as da
 import datetime as dt
 import numpy as np
+import os
 from pyresample.geometry import AreaDefinition
+import tempfile
 import unittest
 try:
     from unittest import mock
@@ -37,7 +40,26 @@ import level1c4pps.seviri2pps_lib as seviri2pps
 import level1c4pps.calibration_coefs as calib
 
 
+def _make_iodc_area(lon_0):
+    """Make a small geos area with the given projection longitude."""
+    return AreaDefinition(area_id='msg_seviri_iodc_3km',
+                          description='test',
+                          proj_id='test',
+                          projection={'proj': 'geos', 'lon_0': lon_0,
+                                      'h': 35785831, 'a': 6378169,
+                                      'b': 6356583.8},
+                          width=3,
+                          height=3,
+                          area_extent=[-1e6, -1e6, 1e6, 1e6])
+
+
 class TestSeviri2PPS(unittest.TestCase):
+    def setUp(self):
+        """Reset caches."""
+        seviri2pps._compute_satellite_angles.cache_clear()
+        seviri2pps._pyorbital_expects_km.cache_clear()
+        seviri2pps._LONLAT_CACHE.clear()
+
     def test_rotate_band(self):
         """Test rotation of bands."""
         area = AreaDefinition(area_id='test',
@@ -85,6 +107,86 @@ class TestSeviri2PPS(unittest.TestCase):
         np.testing.assert_array_equal(lons_m, np.array([1, 2, np.nan, np.nan]))
         np.testing.assert_array_equal(lats_m, np.array([np.nan, np.nan, 1, 2]))
 
+        # Cached per area
+        lons_c, lats_c = seviri2pps.get_lonlats(ds)
+        self.assertIs(lons_c, lons_m)
+        self.assertIs(lats_c, lats_m)
+        area.get_lonlats.assert_called_once()
+
+    def test_get_lonlats_cache_projection(self):
+        """Test that lat/lon caching distinguishes satellite positions."""
+        lons_a, _ = seviri2pps.get_lonlats(
+            mock.MagicMock(attrs={'area': _make_iodc_area(41.5)}))
+        lons_b, _ = seviri2pps.get_lonlats(
+            mock.MagicMock(attrs={'area': _make_iodc_area(45.5)}))
+        self.assertIsNot(lons_a, lons_b)
+        np.testing.assert_allclose(lons_b - lons_a, 4.0)
+
+    @mock.patch('level1c4pps.seviri2pps_lib._LONLAT_CACHE_SIZE', 2)
+    def test_get_lonlats_cache_eviction(self):
+        """Test that the least recently used area is evicted."""
+        ds_a, ds_b, ds_c = [mock.MagicMock(attrs={'area': _make_iodc_area(lon_0)})
+                            for lon_0 in (41.5, 45.5, 0.0)]
+        with mock.patch.object(seviri2pps, '_compute_lonlats',
+                               side_effect=lambda area: (area.crs, area.crs)) as compute:
+            seviri2pps.get_lonlats(ds_a)
+            seviri2pps.get_lonlats(ds_b)
+            seviri2pps.get_lonlats(ds_a)  # Hit, a is now most recently used
+            self.assertEqual(compute.call_count, 2)
+
+            seviri2pps.get_lonlats(ds_c)  # Evicts b
+            self.assertEqual(len(seviri2pps._LONLAT_CACHE), 2)
+            seviri2pps.get_lonlats(ds_a)
+            self.assertEqual(compute.call_count, 3)
+            seviri2pps.get_lonlats(ds_b)
+            self.assertEqual(compute.call_count, 4)
+
+    def test_get_lonlats_zarr_cache(self):
+        """Test caching lat/lon coordinates on disk."""
+        ds_a = mock.MagicMock(attrs={'area': _make_iodc_area(41.5)})
+        ds_b = mock.MagicMock(attrs={'area': _make_iodc_area(45.5)})
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with mock.patch.dict(seviri2pps.CACHE_CONFIG,
+                                 {'cache_dir': cache_dir,
+                                  'cache_lonlats': True}):
+                # Cache miss, one store per satellite position
+                lons_a, lats_a = seviri2pps.get_lonlats(ds_a)
+                lons_b, lats_b = seviri2pps.get_lonlats(ds_b)
+                self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+                # Cache hit
+                seviri2pps._LONLAT_CACHE.clear()
+                with mock.patch.object(AreaDefinition, 'get_lonlats') as get_lonlats:
+                    lons_ac, lats_ac = seviri2pps.get_lonlats(ds_a)
+                    lons_bc, lats_bc = seviri2pps.get_lonlats(ds_b)
+                    get_lonlats.assert_not_called()
+                np.testing.assert_array_equal(lons_ac, lons_a)
+                np.testing.assert_array_equal(lats_ac, lats_a)
+                np.testing.assert_array_equal(lons_bc, lons_b)
+                np.testing.assert_array_equal(lats_bc, lats_b)
+                np.testing.assert_allclose(lons_bc - lons_ac, 4.0)
+
+    def test_mask_lonlats(self):
+        """Test masking of invalid lat/lon coordinates."""
+        lons = np.array([[1, 2, -1234, 1234, np.inf]])
+        lats = np.array([[-1234, 1234, 1, 2, 3]], dtype=float)
+        lons_exp = np.array([[1, 2, np.nan, np.nan, np.nan]])
+        lats_exp = np.array([[np.nan, np.nan, 1, 2, 3]])
+        for kernel in [seviri2pps._get_mask_lonlats_kernel(), None]:
+            with mock.patch('level1c4pps.seviri2pps_lib._get_mask_lonlats_kernel',
+                            return_value=kernel):
+                # Numpy
+                lons_m, lats_m = seviri2pps.mask_lonlats(lons.copy(),
+                                                         lats.copy())
+                np.testing.assert_array_equal(lons_m, lons_exp)
+                np.testing.assert_array_equal(lats_m, lats_exp)
+
+                # Dask
+                lons_m, lats_m = seviri2pps.mask_lonlats(
+                    da.from_array(lons, chunks=2), da.from_array(lats, chunks=2))
+                np.testing.assert_array_equal(lons_m.compute(), lons_exp)
+                np.testing.assert_array_equal(lats_m.compute(), lats_exp)
+
     @mock.patch('level1c4pps.seviri2pps_lib.get_mean_acq_time')
     @mock.patch('level1c4pps.seviri2pps_lib.sun_zenith_angle')
     @mock.patch('level1c4pps.seviri2pps_lib.get_alt_az')
@@ -139,26 +241,95 @@ class TestSeviri2PPS(unittest.TestCase):
                 return 'sata', 176
 
         get_observer_look.side_effect = get_observer_look_patched
-        get_satpos.return_value = 'sat_lon', 'sat_lat', 12345678
+        get_satpos.return_value = 0.01, 0.02, 12345678
         ds = mock.MagicMock(attrs={'start_time': 'start_time'})
         sata, satz = seviri2pps.get_satellite_angles(ds, 'lons', 'lats')
         self.assertEqual(sata, 'sata')
         self.assertEqual(satz, -86)
-        get_observer_look.assert_called_with('sat_lon', 'sat_lat', 12345.678,
+        get_observer_look.assert_called_with(0.01, 0.02, 12345.678,
                                              'start_time', 'lons', 'lats', 0)
 
+        self.assertEqual(get_observer_look.call_count, 3)
+
+        # Same satellite position at a different time hits the cache,
+        # pyorbital is probed once
+        get_observer_look.reset_mock()
+        ds.attrs['start_time'] = 'next_start_time'
+        sata, satz = seviri2pps.get_satellite_angles(ds, 'lons', 'lats')
+        self.assertEqual(satz, -86)
+        get_observer_look.assert_not_called()
+
+        # Satellite position jitter is not rounded away
+        get_satpos.return_value = 0.02, 0.01, 12345679
+        seviri2pps.get_satellite_angles(ds, 'lons', 'lats')
+        get_observer_look.assert_called_once_with(0.02, 0.01, 12345.679,
+                                                  'next_start_time', 'lons', 'lats', 0)
+        get_observer_look.reset_mock()
+
+        # Different satellite position, pyorbital is not probed again
+        get_satpos.return_value = 9.5, 0.0, 12345678
+        sata, satz = seviri2pps.get_satellite_angles(ds, 'lons', 'lats')
+        get_observer_look.assert_called_once_with(9.5, 0.0, 12345.678,
+                                                  'next_start_time', 'lons', 'lats', 0)
+
         # Height in km
-        get_satpos.return_value = 'sat_lon', 'sat_lat', 36000
+        get_satpos.return_value = 0.0, 0.0, 36000
         self.assertRaises(seviri2pps.UnexpectedSatpyVersion,
                           seviri2pps.get_satellite_angles, ds, 'lons', 'lats')
 
         # pyorbital behaves unexpectedly
-        get_satpos.return_value = 'sat_lon', 'sat_lat', 38001
+        get_satpos.return_value = 0.0, 0.0, 38001
         get_observer_look.reset_mock(side_effect=True)
         get_observer_look.return_value = None, 9999
+        seviri2pps._pyorbital_expects_km.cache_clear()
         self.assertRaises(seviri2pps.UnexpectedSatpyVersion,
                           seviri2pps.get_satellite_angles, ds, 'lons', 'lats')
 
+    @mock.patch('level1c4pps.seviri2pps_lib.get_observer_look')
+    @mock.patch('level1c4pps.seviri2pps_lib.satpy.utils.get_satpos')
+    def test_get_satellite_angles_zarr_cache(self, get_satpos, get_observer_look):
+        """Test caching satellite angles on disk."""
+        def get_observer_look_patched(lon, lat, alt, utc_time, lons, lats, elev):
+            if alt == 36000*1000:
+                return None, 31
+            elif alt == 36000:
+                return None, 22
+            return lons + lats, lons - lats
+
+        get_observer_look.side_effect = get_observer_look_patched
+        get_satpos.return_value = 0.0, 0.0, 35786000.0
+        area = AreaDefinition(area_id='test',
+                              description='test',
+                              proj_id='test',
+                              projection={'proj': 'geos', 'h': 35785831},
+                              width=2,
+                              height=2,
+                              area_extent=[1, 2, 3, 4])
+        ds = mock.MagicMock(attrs={'start_time': 'start_time', 'area': area})
+        lons = np.array([[1.0, 2.0], [3.0, 4.0]])
+        lats = np.array([[0.5, 1.5], [2.5, 3.5]])
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with mock.patch.dict(seviri2pps.CACHE_CONFIG,
+                                 {'cache_dir': cache_dir,
+                                  'cache_sensor_angles': True}):
+                # Cache miss
+                sata, satz = seviri2pps.get_satellite_angles(ds, lons, lats)
+                np.testing.assert_array_equal(satz, 90 - (lons - lats))
+                self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+                # Cache hit
+                get_observer_look.reset_mock()
+                sata_c, satz_c = seviri2pps.get_satellite_angles(
+                    ds, lons.copy(), lats.copy())
+                get_observer_look.assert_not_called()
+                np.testing.assert_array_equal(sata_c, sata)
+                np.testing.assert_array_equal(satz_c, satz)
+
+                # Different satellite position
+                get_satpos.return_value = 9.5, 0.0, 35786000.0
+                seviri2pps.get_satellite_angles(ds, lons, lats)
+                self.assertEqual(len(os.listdir(cache_dir)), 2)
+
     def test_set_attrs(self):
         """Test setting scene attributes."""
         seviri2pps.BANDNAMES = ['VIS006', 'IR_108']
@@ -180,6 +351,27 @@ class TestSeviri2PPS(unittest.TestCase):
         self.assertNotIn('orbital_parameters', scene.attrs)
         self.assertNotIn('georef_offset_corrected', scene.attrs)
 
+    @mock.patch('level1c4pps.seviri2pps_lib.BANDNAMES',
+                ['VIS006', 'VIS008', 'IR_016', 'IR_108'])
+    def test_set_attrs_parallel(self):
+        """Test setting band attributes in parallel."""
+        scene_dict = {band: mock.MagicMock(attrs={'sensor': 'seviri'})
+                      for band in seviri2pps.BANDNAMES}
+        scene_dict['IR_108'].attrs['platform_name'] = 'myplatform'
+        scene = mock.MagicMock(attrs={})
+        scene.__getitem__.side_effect = scene_dict.__getitem__
+
+        with mock.patch('level1c4pps.seviri2pps_lib.dask.compute',
+                        wraps=seviri2pps.dask.compute) as compute:
+            seviri2pps.set_attrs(scene)
+            compute.assert_called_once()
+        for image_num, band in enumerate(seviri2pps.BANDNAMES):
+            self.assertEqual(scene[band].attrs['name'],
+                             'image{:d}'.format(image_num))
+            self.assertEqual(scene[band].attrs['id_tag'],
+                             seviri2pps.PPS_TAGNAMES[band])
+            self.assertNotIn('sensor', scene[band].attrs)
+
     def test_get_mean_acq_time(self):
         """Test computation of mean scanline acquisition time."""
         seviri2pps.BANDNAMES = ['VIS006', 'IR_108']
@@ -269,17 +461,20 @@ class TestSeviri2PPS(unittest.TestCase):
         np.testing.assert_array_equal(scene['lat'].data, lats)
         self.assertEqual(scene['lat'].attrs['units'], 'degrees_north')
 
-        # Test angles
-        np.testing.assert_array_equal(scene['sunzenith'].data, sunz)
+        # Test angles (scaled to int16)
+        np.testing.assert_allclose(scene['sunzenith'].data * 0.01, sunz)
         self.assertEqual(scene['sunzenith'].attrs['name'], 'sunzenith')
 
-        np.testing.assert_array_equal(scene['satzenith'].data, satz)
+        np.testing.assert_allclose(scene['satzenith'].data * 0.01, satz)
         self.assertEqual(scene['satzenith'].attrs['name'], 'satzenith')
 
-        np.testing.assert_array_equal(scene['azimuthdiff'].data, azidiff)
+        np.testing.assert_allclose(scene['azimuthdiff'].data * 0.01, azidiff)
         self.assertEqual(scene['azimuthdiff'].attrs['name'], 'azimuthdiff')
 
         for angle in ['azimuthdiff', 'satzenith', 'sunzenith']:
+            self.assertEqual(scene[angle].dtype, np.int16)
+            self.assertEqual(scene[angle].attrs['scale_factor'], 0.01)
+            self.assertEqual(scene[angle].attrs['add_offset'], 0.0)
             self.assertTupleEqual(scene[angle].dims, ('y', 'x'))
             np.testing.assert_array_equal(scene[angle].coords['x'].data, xvals)
             np.testing.assert_array_equal(scene[angle].coords['y'].data, yvals)
@@ -294,6 +489,22 @@ class TestSeviri2PPS(unittest.TestCase):
             np.testing.assert_array_equal(scene[name].coords['y'].data, yvals)
             self.assertEqual(scene[name].attrs['start_time'], start_time)
             self.assertEqual(scene[name].attrs['end_time'], end_time)
+            self.assertEqual(scene[name].chunks, ((2, ), (2, )))
+
+        # Test chunking of numpy and dask arrays
+        seviri2pps.add_ancillary_datasets(scene, lons=lons, lats=lats,
+                                          sunz=sunz,
+                                          satz=da.from_array(satz, chunks=2),
+                                          azidiff=azidiff, chunks=(1, 2))
+        for name in ['lon', 'lat', 'azimuthdiff', 'satzenith', 'sunzenith']:
+            self.assertEqual(scene[name].chunks, ((1, 1), (2, )))
+        np.testing.assert_allclose(scene['satzenith'].data * 0.01, satz)
+
+    def test_scale_angle(self):
+        """Test scaling angles to int16."""
+        angle = da.from_array(np.array([[0.0, 12.344], [179.996, np.nan]]))
+        np.testing.assert_array_equal(seviri2pps.scale_angle(angle),
+                                      [[0, 1234], [18000, -32767]])
 
     def test_compose_filename(self):
         """Test compose filename for seviri."""
@@ -376,6 +587,13 @@ class TestSeviri2PPS(unittest.TestCase):
         encoding = seviri2pps.get_encoding_seviri(scene)
         self.assertDictEqual(encoding, encoding_exp)
 
+        # Angles already scaled to int16
+        scene['sunzenith'].attrs['scale_factor'] = 0.01
+        encoding = seviri2pps.get_encoding_seviri(scene)
+        self.assertNotIn('scale_factor', encoding['image11'])
+        self.assertNotIn('add_offset', encoding['image11'])
+        self.assertDictEqual(encoding['image12'], enc_exp_angles)
+
     def test_get_header_attrs(self):
         """Test get the header attributes."""
         start_time = dt.datetime(2009, 7, 1, 12, 15)
@@ -393,6 +611,48 @@ class TestSeviri2PPS(unittest.TestCase):
         header_attrs = seviri2pps.get_header_attrs(scene)
         self.assertDictEqual(header_attrs, header_attrs_exp)
 
+    @mock.patch('level1c4pps.seviri2pps_lib.dask.compute')
+    @mock.patch('dask.distributed.Client')
+    def test_process_scenes_batch(self, client, compute):
+        """Test processing several scans in parallel."""
+        compute.return_value = ('file1.nc', 'file2.nc')
+        tslot_files_list = [['H-000-MSG4__-MSG4________-IR_108___-000001___-201901011200-__'],
+                            ['H-000-MSG4__-MSG4________-IR_108___-000001___-201901011215-__']]
+        fnames = seviri2pps.process_scenes_batch(tslot_files_list, '/out/path',
+                                                 n_workers=2, rotate=False)
+        self.assertListEqual(fnames, ['file1.nc', 'file2.nc'])
+        client.assert_called_once_with(n_workers=2, threads_per_worker=1)
+        tasks = compute.call_args[0]
+        self.assertEqual(len(tasks), 2)
+        self.assertEqual(compute.call_args[1]['scheduler'],
+                         client.return_value.__enter__.return_value)
+
+    @mock.patch('level1c4pps.seviri2pps_lib.process_one_scan')
+    def test_process_scenes_batch_cache_config(self, process_one_scan):
+        """Test passing the cache configuration to the workers."""
+        def process_one_scan_patched(tslot_files, out_path, **kwargs):
+            self.assertEqual(seviri2pps.CACHE_CONFIG['cache_dir'], '/cache')
+            return 'file.nc'
+
+        process_one_scan.side_effect = process_one_scan_patched
+        cache_config = {'cache_dir': '/cache',
+                        'cache_lonlats': True,
+                        'cache_sensor_angles': False}
+        with mock.patch.dict(seviri2pps.CACHE_CONFIG):
+            fname = seviri2pps._process_one_scan_with_cache_config(
+                cache_config, ['file1'], '/out/path', rotate=False)
+        self.assertEqual(fname, 'file.nc')
+        process_one_scan.assert_called_once_with(['file1'], '/out/path',
+                                                 rotate=False)
+
+    def test_process_one_scan_compression_engine(self):
+        """Test that zstd compression is rejected for the h5netcdf engine."""
+        with mock.patch('level1c4pps.seviri2pps_lib.Scene') as scene:
+            self.assertRaises(ValueError, seviri2pps.process_one_scan,
+                              [], '/out/path', engine='h5netcdf',
+                              compression='zstd')
+            scene.assert_not_called()
+
     def test_add_proj_satpos(self):
         """Test adding projection and satellite position."""
         ir_108 = mock.MagicMock(attrs={
@@ -488,6 +748,24 @@ class TestCalibration(unittest.TestCase):
                 np.testing.assert_allclose(coefs[channel]['offset'],
                                            ref[channel]['offset'])
 
+    def test_get_calibration_for_times(self):
+        """Test MODIS-intercalibrated gain and offset for multiple times."""
+        times = [dt.datetime(2018, 1, 18, 0, 0),
+                 dt.datetime(2018, 1, 18, 23, 59),
+                 dt.datetime(2019, 6, 1, 12, 0)]
+        coefs = calib.get_calibration_for_times(
+            platform='MSG3', times=np.array(times, dtype='datetime64[ns]'))
+        for i, time in enumerate(times):
+            ref = calib.get_calibration_for_time(platform='MSG3', time=time)
+            for channel in ref.keys():
+                np.testing.assert_allclose(coefs[channel]['gain'][i],
+                                           ref[channel]['gain'])
+                np.testing.assert_allclose(coefs[channel]['offset'][i],
+                                           ref[channel]['offset'])
+
+        self.assertRaises(ValueError, calib.get_calibration_for_times,
+                          'MSG3', [dt.datetime(1999, 1, 1)])
+
     def test_get_calibration(self):
         """Test MODIS-intercalibrated for date and time."""
         coefs1 = calib.get_calibration_for_time(